@@ -1,5 +1,7 @@
-import PIL
+import io
+import PIL.Image
 import IPython
+import functools
 
 import numpy as np
 import fresnel as fl
@@ -11,6 +13,54 @@ import fresnel as fl
 #    pass
 
 
+_GREY_LINEAR = fl.color.linear([.25,.25,.25])
+
+
+@functools.lru_cache(maxsize=32)
+def _make_materials(roughness, metal, specular, spec_trans):
+    """
+    Build (and memoize) the body/outline material pair for a given set of material parameters
+    """
+    
+    material = fl.material.Material(color=_GREY_LINEAR,
+                                    roughness=roughness,
+                                    metal=metal,
+                                    specular=specular,
+                                    spec_trans=spec_trans,
+                                    primitive_color_mix=1.,
+                                    solid=0.)
+    outline_material = fl.material.Material(color=_GREY_LINEAR,
+                                            roughness=2*roughness,
+                                            metal=metal,
+                                            specular=specular,
+                                            spec_trans=spec_trans,
+                                            primitive_color_mix=0.,
+                                            solid=0.)
+                                            
+    return material, outline_material
+
+
+def _unbound_atoms(num_atoms, bonds):
+    """
+    Indices of the particles not involved in any bond
+    """
+    
+    polymer_mask = np.ones(num_atoms, dtype=bool)
+    polymer_mask[bonds] = False
+    
+    return np.flatnonzero(polymer_mask)
+
+
+def _bond_endpoints(bonds):
+    """
+    Contiguous int32 index arrays of the first and second particle of each bond
+    """
+    
+    bonds = np.asarray(bonds).astype(np.int32, casting='same_kind', copy=False)
+    
+    return np.ascontiguousarray(bonds.T)
+
+
 class Fresnel():
     """
     Fresnel API for interactive/notebook-embedded visualization.
@@ -74,12 +124,16 @@ class Fresnel():
         else:
             canvas = fl.preview(self.scene, h=height, w=width)
         
+        image = PIL.Image.fromarray(np.asarray(canvas[:]), mode='RGBA')
+        
         if png_output_file:
-            image = PIL.Image.fromarray(canvas[:], mode='RGBA')
-            image.save(png_output_file)
+            image.save(png_output_file, format='PNG', optimize=False, compress_level=1)
             
         else:
-            return IPython.display.Image(canvas._repr_png_())
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG', compress_level=1)
+            
+            return IPython.display.Image(buffer.getvalue())
             
 
     def _fresnel(self,
@@ -92,7 +146,8 @@ class Fresnel():
                  specular=0.8,
                  spec_trans=0.1,
                  roughness=0.2,
-                 outline=0.05):
+                 outline=0.05,
+                 skip_gamma=False):
         """
         Render individual polymer/particle configurations using the Fresnel backend library
             
@@ -118,55 +173,57 @@ class Fresnel():
             Controls the amount of specular light transmission. In the range [0,1]
         outline : float
             Width of the outline material
+        skip_gamma : bool
+            Set to True if colors are already supplied in linear space, to bypass sRGB to linear conversion
         
         Returns
         -------
             IPython image object suitable for embedding in Jupyter notebooks
+            
+        Notes
+        -----
+            Input arrays are cast once to contiguous float32 (int32 for bonds) to match fresnel's native buffer layout
         """
+        
+        positions = np.ascontiguousarray(positions, dtype=np.float32)
+        colors = np.ascontiguousarray(colors, dtype=np.float32)
+        radii = np.ascontiguousarray(radii, dtype=np.float32)
+        bonds = np.asarray(bonds).astype(np.int32, casting='same_kind')
             
         scene = fl.Scene()
         
         geometry = fl.geometry.Cylinder(scene, N=bonds.shape[0], outline_width=outline)
+        
+        bond_starts, bond_ends = _bond_endpoints(bonds)
 
-        geometry.points[:] = positions[bonds]
-        geometry.radius[:] = radii[bonds].min(axis=1)
+        geometry.points[:, 0, :] = positions[bond_starts]
+        geometry.points[:, 1, :] = positions[bond_ends]
+        geometry.radius[:] = np.minimum(radii[bond_starts], radii[bond_ends])
         
-        corrected_colors = fl.color.linear(colors)
+        if skip_gamma:
+            corrected_colors = colors
+        else:
+            corrected_colors = fl.color.linear(colors)
 
         if corrected_colors.shape[0] == positions.shape[0]:
-                geometry.color[:] = corrected_colors[bonds]
+                geometry.color[:, 0, :] = corrected_colors[bond_starts]
+                geometry.color[:, 1, :] = corrected_colors[bond_ends]
         elif corrected_colors.shape[0] == bonds.shape[0]:
                 geometry.color[:] = corrected_colors[:, None, :]
         else:
                 raise ValueError("Color array does not match particle or bond dimensions")
 
-        geometry.material = fl.material.Material(color=fl.color.linear([.25,.25,.25]),
-                                                 roughness=roughness,
-                                                 metal=metal,
-                                                 specular=specular,
-                                                 spec_trans=spec_trans,
-                                                 primitive_color_mix=1.,
-                                                 solid=0.)
-        geometry.outline_material = fl.material.Material(color=fl.color.linear([.25,.25,.25]),
-                                                         roughness=2*roughness,
-                                                         metal=metal,
-                                                         specular=specular,
-                                                         spec_trans=spec_trans,
-                                                         primitive_color_mix=0.,
-                                                         solid=0.)
-            
-        polymer_mask = np.ones(positions.shape[0], dtype=bool)
-        polymer_mask[bonds] = False
-            
-        num_unbound_atoms = np.count_nonzero(polymer_mask)
-            
-        if num_unbound_atoms > 0:
-            geometry2 = fl.geometry.Sphere(scene, N=num_unbound_atoms, outline_width=outline)
+        geometry.material, geometry.outline_material = _make_materials(float(roughness), float(metal), float(specular), float(spec_trans))
+            
+        unbound_atoms = _unbound_atoms(positions.shape[0], bonds)
+            
+        if unbound_atoms.size > 0:
+            geometry2 = fl.geometry.Sphere(scene, N=unbound_atoms.size, outline_width=outline)
                 
-            geometry2.radius[:] = radii[polymer_mask]
-            geometry2.position[:] = positions[polymer_mask]
+            geometry2.radius[:] = radii[unbound_atoms]
+            geometry2.position[:] = positions[unbound_atoms]
             
-            geometry2.color[:] = corrected_colors[polymer_mask]
+            geometry2.color[:] = corrected_colors[unbound_atoms]
 
             geometry2.material = geometry.material
             geometry2.outline_material = geometry.outline_material
@@ -175,3 +232,53 @@ class Fresnel():
         scene.lights.append(fl.light.Light(direction=[0,0,1], color=[intensity]*3, theta=np.pi))
                                                 
         return scene
+
+
+class FresnelSequence(Fresnel):
+    """
+    Fresnel API for rendering successive frames of a trajectory within a single persistent scene.
+    
+    The scene, geometries and materials are built once from the first frame, and only particle positions are updated
+    between frames. Bonds, colors, radii and material parameters are therefore fixed for the whole sequence,
+    and the camera remains fitted to the first frame.
+        
+    See the _fresnel backend method for a full list of arguments and parameters
+    """
+        
+    def __init__(self, positions, bonds, *args, **kwargs):
+    
+        super().__init__(positions, bonds, *args, **kwargs)
+        
+        self.num_atoms = positions.shape[0]
+        
+        self.bond_starts, self.bond_ends = _bond_endpoints(bonds)
+        self.unbound_atoms = _unbound_atoms(self.num_atoms, bonds)
+        
+        self.cylinders = self.scene.geometry[0]
+        self.spheres = self.scene.geometry[1] if self.unbound_atoms.size > 0 else None
+            
+            
+    def render_frame(self, positions, **kwargs):
+        """
+        Update particle positions in the persistent scene and render the resulting frame
+        
+        Parameters
+        ----------
+        positions : Nx3 float array
+            List of 3D positions of the monomers for the current frame
+        kwargs :
+            Rendering options passed on to the static method
+        """
+        
+        positions = np.ascontiguousarray(positions, dtype=np.float32)
+        
+        if positions.shape[0] != self.num_atoms:
+            raise ValueError("Frame has %d particles, expected %d" % (positions.shape[0], self.num_atoms))
+        
+        self.cylinders.points[:, 0, :] = positions[self.bond_starts]
+        self.cylinders.points[:, 1, :] = positions[self.bond_ends]
+        
+        if self.spheres is not None:
+            self.spheres.position[:] = positions[self.unbound_atoms]
+            
+        return self.static(**kwargs)
@@ -9,7 +9,8 @@ from matplotlib.colors import ListedColormap, NoNorm
 def chromosome_viewer(chrom_lengths, 
                       colors=None,
                       height=0.5,
-                      width=10.):
+                      width=10.,
+                      rng=None):
     """
     Simple matplotlib-based visualization of individual chromosomes 
     
@@ -24,40 +25,40 @@ def chromosome_viewer(chrom_lengths,
             Per-chromosome height of the output figure (in inches)
         width : float
             Total width of the output figure (in inches)
+        rng : int or numpy.random.Generator or None
+            Seed or random number generator used to draw chromosome colors when none are provided.
+            If None, colors are drawn from fresh OS entropy and are not affected by np.random.seed()
     """
     
     num_chrom = chrom_lengths.shape[0]
-    chrom_bounds = np.insert(np.cumsum(chrom_lengths), 0, 0)
+    chrom_bounds = np.insert(np.cumsum(chrom_lengths), 0, 0).tolist()
     
     fig = plt.figure(figsize=(width, height*num_chrom))
     
-    heights = np.linspace(1, 0, num=num_chrom)
-    lengths = chrom_lengths.astype(np.float32)/chrom_lengths.max()
+    heights = np.linspace(1, 0, num=num_chrom).tolist()
+    lengths = (chrom_lengths.astype(np.float32)/chrom_lengths.max()).tolist()
     
-    if not isinstance(colors, np.ndarray):
-        colors = np.ones((num_chrom, 4))
-        colors[:, :3] = np.random.random((num_chrom, 3))
+    if isinstance(colors, np.ndarray):
+        color_blocks = np.split(colors, chrom_bounds[1:])
         
-        colors = np.repeat(colors, chrom_lengths, axis=0)
+    else:
+        rng = np.random.default_rng(rng)
+        
+        base_colors = np.ones((num_chrom, 4), dtype=np.float32)
+        base_colors[:, :3] = rng.random((num_chrom, 3), dtype=np.float32)
+        
+        color_blocks = [np.broadcast_to(base_colors[i], (hi-lo, 4))
+                        for i, (lo, hi) in enumerate(zip(chrom_bounds[:-1], chrom_bounds[1:]))]
 
-    for i in range(num_chrom):
+    for i, (chrom_height, chrom_length, chrom_colors) in enumerate(zip(heights, lengths, color_blocks)):
         map_name = "chromosome %d" % (i+1)
-        ax = fig.add_axes([(1-lengths[i])/2., heights[i], lengths[i], height/num_chrom])
+        ax = fig.add_axes([(1-chrom_length)/2., chrom_height, chrom_length, height/num_chrom])
         
         ax.set_title(map_name)
     
-        chrom_colors = colors[chrom_bounds[i]:chrom_bounds[i+1], :]
         chrom_map = ListedColormap(chrom_colors, name=map_name)
         
-        try:
-            plt.register_cmap(name=map_name, cmap=chrom_map)
-            
-        except ValueError:
-            pass
-        
-        plt.set_cmap(chrom_map)
-        
-        cb = ColorbarBase(ax, orientation='horizontal', norm=NoNorm())
+        cb = ColorbarBase(ax, cmap=chrom_map, orientation='horizontal', norm=NoNorm())
     
         cb.locator = AutoLocator()
         cb.update_ticks()